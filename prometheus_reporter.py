@@ -0,0 +1,415 @@
+import itertools
+import json
+from dataclasses import dataclass
+import os
+import sys
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+
+# orjson decodes large Prometheus responses several times faster than the
+# stdlib; fall back to json when it isn't installed.
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+# ijson enables streaming the result array item by item, keeping peak
+# memory O(1) for fleet-wide queries; without it responses parse in full.
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# PROMETHEUS_URL = "https://prom.karizmastudios.org/api/v1/query"
+PROMETHEUS_URL = "https://prom.karizmastudios.org/api/v1/query"
+
+# Shared session so all queries reuse one TCP+TLS connection pool instead of
+# paying a fresh handshake per request; transient gateway errors retry with
+# backoff and responses come back gzip-compressed.
+SESSION = requests.Session()
+SESSION.headers['Accept-Encoding'] = 'gzip'
+SESSION.mount('https://', HTTPAdapter(
+    max_retries=Retry(total=3, backoff_factor=0.3,
+                      status_forcelist=[502, 503, 504]),
+    pool_connections=8, pool_maxsize=8))
+
+# (connect, read) timeouts so a hung Prometheus can't stall a run forever
+REQUEST_TIMEOUT = (3.05, 30)
+
+# Bound concurrency and request rate so many replicas of this script can't
+# stampede Prometheus.  The semaphore caps in-flight queries; the token
+# bucket spaces them at 1/QPS.
+QUERY_SEM = threading.Semaphore(int(os.getenv('PROM_MAX_CONCURRENCY', '4')))
+QUERY_QPS = float(os.getenv('PROM_QPS', '10'))
+
+_rate_lock = threading.Lock()
+_next_allowed_ts = 0.0
+_queue_wait_seconds = 0.0  # accumulated throttle wait, for observability
+
+def _bucket_wait():
+    """Sleeps until this request's 1/QPS slot opens."""
+    global _next_allowed_ts, _queue_wait_seconds
+    with _rate_lock:
+        now = time.monotonic()
+        wait = _next_allowed_ts - now
+        _next_allowed_ts = max(_next_allowed_ts, now) + 1.0 / QUERY_QPS
+    if wait > 0:
+        time.sleep(wait)
+        with _rate_lock:
+            _queue_wait_seconds += wait
+
+# Short-lived result cache so repeated invocations within the TTL window
+# (scheduled runs, library imports) hit a local dict instead of Prometheus.
+CACHE_TTL = float(os.getenv('PROM_CACHE_TTL', '10'))
+
+_query_cache = {}
+_query_cache_lock = threading.RLock()
+
+def clear_cache():
+    """Drops all cached query results."""
+    with _query_cache_lock:
+        _query_cache.clear()
+
+def query_prometheus(query, consumer=None):
+    """
+    Runs a query and returns the parsed result list.
+
+    If consumer is given, each result item is passed to consumer(item)
+    instead and nothing is returned; with ijson installed the response is
+    stream-parsed so the full result list is never materialized (streamed
+    results bypass the TTL cache for the same reason).
+    """
+    # The lock is held across the fetch so concurrent callers of the same
+    # query share one request instead of stampeding Prometheus.
+    with _query_cache_lock:
+        cached = _query_cache.get(query)
+        if cached is not None and time.monotonic() - cached[0] < CACHE_TTL:
+            if consumer is None:
+                return cached[1]
+            for item in cached[1]:
+                consumer(item)
+            return None
+
+        if consumer is not None and ijson is not None:
+            with QUERY_SEM:
+                _bucket_wait()
+                response = SESSION.get(PROMETHEUS_URL, params={'query': query},
+                                       stream=True, timeout=REQUEST_TIMEOUT)
+            response.raise_for_status()
+            response.raw.decode_content = True
+            for item in ijson.items(response.raw, 'data.result.item'):
+                consumer(item)
+            return None
+
+        with QUERY_SEM:
+            _bucket_wait()
+            response = SESSION.get(PROMETHEUS_URL, params={'query': query},
+                                   timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        # Decode response.content directly: skips the charset sniffing that
+        # response.json() does on top of the parse.
+        result = _json_loads(response.content)['data']['result']
+        _query_cache[query] = (time.monotonic(), result)
+        if consumer is None:
+            return result
+        for item in result:
+            consumer(item)
+        return None
+
+# All metrics in one expression: each sub-query is tagged with a synthetic
+# __kind__ label via label_replace and the pieces are unioned with `or`, so
+# one round-trip fetches everything and the result is partitioned client-side.
+BATCH_QUERY = ' or '.join([
+    'label_replace(avg by(instance, job)(rate(node_cpu_seconds_total{mode="idle"}[5m])) * 100, "__kind__", "cpu_idle", "", "")',
+    'label_replace(count by(instance, job)(node_cpu_seconds_total{mode="user"}), "__kind__", "cpu_cores", "", "")',
+    'label_replace(node_memory_MemTotal_bytes, "__kind__", "mem_total", "", "")',
+    'label_replace(node_memory_MemAvailable_bytes, "__kind__", "mem_avail", "", "")',
+    'label_replace(node_filesystem_size_bytes, "__kind__", "disk_total", "", "")',
+    'label_replace(node_filesystem_free_bytes, "__kind__", "disk_free", "", "")',
+])
+
+# Report templates shared by every node; formatting one precompiled template
+# per node is cheaper than rebuilding a list of f-strings each iteration.
+NODE_TMPL = (
+    "Node: {node} (IP: {ip})\n"
+    " CPU cores: {cores}\n"
+    " CPU used: {used_cpu:.2f}%\n"
+    " CPU free: {free_cpu:.2f}%\n"
+    " Memory total: {mem_total:.2f} GB\n"
+    " Memory used: {mem_used:.2f} GB\n"
+    " Memory free: {mem_free:.2f} GB\n"
+    " Disks:\n"
+)
+
+DISK_TMPL = (
+    "  Mountpoint: {mountpoint}\n"
+    "    Total: {total_gb:.2f} GB\n"
+    "    Used: {used_gb:.2f} GB\n"
+    "    Free: {free_gb:.2f} GB\n"
+)
+
+@dataclass(slots=True)
+class Disk:
+    """One mountpoint's usage figures; slots keep it far smaller than the
+    four-key dict it replaces."""
+    mountpoint: str
+    total_gb: float
+    used_gb: float
+    free_gb: float
+    free_pct: float
+
+# Multiplying by a precomputed reciprocal is cheaper than dividing, and the
+# conversion runs 4*(1+D) times per node.
+_BYTES_TO_GB = 1.0 / (1024 ** 3)
+
+def bytes_to_gb(b):
+    return b * _BYTES_TO_GB
+
+def extract_ip(instance):
+    # instance format: "IP:port"
+    return instance.split(':')[0]
+
+def make_kind_consumer():
+    """
+    Returns (consume, scalars, disks): feeding batch result items to
+    consume() files them into the dicts by their synthetic __kind__ label:
+      scalars[kind] = {instance: (value, labels_dict)}
+      disks[kind] = {instance: {mountpoint: bytes_value}}
+    """
+    scalars = {'cpu_idle': {}, 'cpu_cores': {}, 'mem_total': {}, 'mem_avail': {}}
+    disks = {'disk_total': {}, 'disk_free': {}}
+
+    # Default-arg bindings keep float and the kind dispatch as local
+    # lookups inside the hot per-item path, and .get dispatch avoids the
+    # membership-test-plus-subscript double hash of `kind in d: d[kind]`.
+    def consume(item, _float=float, _get_scalar=scalars.get, _get_disk=disks.get):
+        labels = item['metric']
+        instance = labels.get('instance')
+        if not instance:
+            return
+        kind = labels.get('__kind__')
+        target = _get_scalar(kind)
+        if target is not None:
+            target[instance] = (_float(item['value'][1]), labels)
+            return
+        target = _get_disk(kind)
+        if target is not None:
+            mount = labels.get('mountpoint')
+            if mount:
+                target.setdefault(instance, {})[mount] = _float(item['value'][1])
+
+    return consume, scalars, disks
+
+def split_by_kind(results):
+    """
+    Partitions an already-parsed batch result list by __kind__; kept for
+    callers holding a full result list.
+    """
+    consume, scalars, disks = make_kind_consumer()
+    for item in results:
+        consume(item)
+    return scalars, disks
+
+# Filename sanitization table: one C-level pass instead of chained
+# .replace calls, and covers ':' and '\\' too.
+_SANITIZE = str.maketrans({' ': '_', '/': '_', ':': '_', '\\': '_'})
+
+# One encode buffer reused across all report writes; dropped and
+# reallocated if an unusually large report ever grows it past the cap.
+_BUF = bytearray()
+_BUF_CAP = 128 * 1024
+
+def write_node_reports(reports):
+    """
+    Writes accumulated (node_name, report_text) pairs, one file per node.
+
+    Uses os.open/os.write directly so each file costs a single write
+    syscall, and emits all the diagnostics with one stdout write.
+    """
+    global _BUF
+    diagnostics = []
+    # Hold one fd on the reports directory and open files relative to it,
+    # so every write skips the path walk from cwd.
+    dir_fd = os.open('./reports', os.O_RDONLY)
+    try:
+        for node_name, report_text in reports:
+            # Sanitize filename (remove spaces or special chars)
+            safe_name = node_name.translate(_SANITIZE)
+            filename = f"node_{safe_name}.txt"
+            fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                         0o644, dir_fd=dir_fd)
+            try:
+                _BUF.clear()
+                _BUF += report_text.encode('utf-8')
+                os.write(fd, _BUF)
+            finally:
+                os.close(fd)
+            diagnostics.append(f"Written report for {node_name} to {filename}")
+    finally:
+        os.close(dir_fd)
+        if len(_BUF) > _BUF_CAP:
+            _BUF = bytearray()
+    if diagnostics:
+        sys.stdout.write("\n".join(diagnostics) + "\n")
+
+def report_nodes_with_free_resources(nodes_data, cpu_free_threshold=40, mem_free_threshold=40, disk_free_threshold=40):
+    """
+    nodes_data: dict keyed by node name, each value is dict with keys:
+        - cpu_free_percent (float)
+        - mem_total (float in GB)
+        - mem_free (float in GB)
+        - mem_free_pct (float, precomputed in main)
+        - max_disk_free_pct (float, precomputed in main)
+        - disks: list of Disk instances (free_pct precomputed in main)
+    Thresholds are percentages for free CPU, memory, and disk space.
+    
+    Prints summary of nodes that have >= thresholds free resources and
+    returns the summary text.
+    """
+    out = []
+    out.append("\nNodes with more than {}% CPU free, {}% Memory free, and {}% Disk free:\n".format(cpu_free_threshold, mem_free_threshold, disk_free_threshold))
+
+    for node, data in nodes_data.items():
+        # Cheapest predicates first: most nodes fail on CPU or memory, so
+        # they never pay for the disk scan.
+        cpu_free = data.get('cpu_free_percent', 0)
+        if cpu_free < cpu_free_threshold:
+            continue
+        mem_free_pct = data.get('mem_free_pct', 0)
+        if mem_free_pct < mem_free_threshold:
+            continue
+        # The best per-node disk free percentage was precomputed in main,
+        # so deciding eligibility needs no disk scan at all.
+        if data.get('max_disk_free_pct', 0) < disk_free_threshold:
+            continue
+
+        mem_free = data.get('mem_free', 0)
+        out.append(f"Node: {node}")
+        out.append(f"  CPU free: {cpu_free:.2f}%")
+        out.append(f"  Memory free: {mem_free:.2f} GB ({mem_free_pct:.2f}%)")
+        out.append("  Disk(s) with sufficient free space:")
+        for disk in data.get('disks', []):
+            if disk.free_pct >= disk_free_threshold:
+                out.append(f"    Mountpoint: {disk.mountpoint}, Free: {disk.free_gb:.2f} GB ({disk.free_pct:.2f}%)")
+        out.append("-" * 40)
+
+    # One write for the whole summary instead of a print per line
+    summary = "\n".join(out) + "\n"
+    sys.stdout.write(summary)
+    return summary
+
+def main():
+    # Ensure the output directory exists once up front instead of failing
+    # on the first write.
+    os.makedirs('./reports', exist_ok=True)
+
+    # One batch query fetches every metric the report needs; items stream
+    # straight into the per-kind dicts without an intermediate result list.
+    consume, scalars, disks = make_kind_consumer()
+    query_prometheus(BATCH_QUERY, consumer=consume)
+
+    cpu_idle = scalars['cpu_idle']
+    cpu_cores = scalars['cpu_cores']
+    mem_total = scalars['mem_total']
+    mem_avail = scalars['mem_avail']
+    disk_total = disks['disk_total']
+    disk_free = disks['disk_free']
+
+    # Map instance -> friendly node name (job label); the labels are already
+    # on the mem_total results, no extra query needed.
+    instance_to_job = {inst: labels.get('job', inst)
+                       for inst, (_v, labels) in mem_total.items()}
+
+    # Union of all instances seen across metrics; dict.fromkeys dedupes in
+    # one C-level pass instead of building six throwaway sets.
+    all_instances = list(dict.fromkeys(itertools.chain(
+        cpu_idle, cpu_cores, mem_total, mem_avail, disk_total, disk_free)))
+    all_instances.sort()  # deterministic report and file order
+
+    nodes_data = {}
+    reports = []
+
+    # Outer-join of the metric dicts per instance.  Binding the lookups
+    # once outside the loop keeps the per-node merge to plain C-level
+    # method calls with a shared missing-value default.
+    _missing = (0, None)
+    get_cores = cpu_cores.get
+    get_idle = cpu_idle.get
+    get_mem_t = mem_total.get
+    get_mem_a = mem_avail.get
+    get_inst_disks = disk_total.get
+
+    for instance in all_instances:
+        node_name = instance_to_job.get(instance, instance)
+        ip = extract_ip(instance)
+
+        cores = get_cores(instance, _missing)[0]
+        idle_cpu = get_idle(instance, _missing)[0]
+        used_cpu = 100 - idle_cpu if idle_cpu else 0
+
+        mem_t = get_mem_t(instance, _missing)[0]
+        mem_a = get_mem_a(instance, _missing)[0]
+        mem_used = mem_t - mem_a if mem_t and mem_a else 0
+
+        disks_list = []
+        inst_disks = get_inst_disks(instance)
+        if inst_disks:
+            free_map = disk_free.get(instance, {})
+            for mountpoint, total_bytes in inst_disks.items():
+                free_bytes = free_map.get(mountpoint, 0)
+                used_bytes = total_bytes - free_bytes
+                disks_list.append(Disk(
+                    mountpoint=mountpoint,
+                    total_gb=bytes_to_gb(total_bytes),
+                    used_gb=bytes_to_gb(used_bytes),
+                    free_gb=bytes_to_gb(free_bytes),
+                    free_pct=(free_bytes / total_bytes * 100) if total_bytes else 0,
+                ))
+
+        header = NODE_TMPL.format_map({
+            'node': node_name,
+            'ip': ip,
+            'cores': int(cores),
+            'used_cpu': used_cpu,
+            'free_cpu': idle_cpu,
+            'mem_total': bytes_to_gb(mem_t),
+            'mem_used': bytes_to_gb(mem_used),
+            'mem_free': bytes_to_gb(mem_a),
+        })
+
+        if disks_list:
+            disks_block = "".join(
+                DISK_TMPL.format(mountpoint=d.mountpoint, total_gb=d.total_gb,
+                                 used_gb=d.used_gb, free_gb=d.free_gb)
+                for d in disks_list)
+        else:
+            disks_block = "  No disk data available\n"
+
+        report_text = header + disks_block + "-" * 40
+
+        # Collect for a single batched write after the loop
+        reports.append((node_name, report_text))
+
+        # Store data for filtering
+        nodes_data[node_name] = {
+            'cpu_free_percent': idle_cpu,
+            'mem_total': bytes_to_gb(mem_t),
+            'mem_free': bytes_to_gb(mem_a),
+            'mem_free_pct': (mem_a / mem_t * 100) if mem_t else 0,
+            'max_disk_free_pct': max((d.free_pct for d in disks_list), default=0),
+            'disks': disks_list,
+        }
+
+    # Write all per-node reports in one batch
+    write_node_reports(reports)
+
+    # Report nodes with more than 40% free resources
+    report_nodes_with_free_resources(nodes_data, cpu_free_threshold=40, mem_free_threshold=40, disk_free_threshold=40)
+
+if __name__ == "__main__":
+    main()
+